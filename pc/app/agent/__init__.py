@@ -1,4 +1,4 @@
-from app.agent.base import BaseAgent
+from app.agent.base import BaseAgent, run_agents_parallel
 from app.agent.planning import PlanningAgent
 from app.agent.react import ReActAgent
 from app.agent.swe import SWEAgent
@@ -11,4 +11,5 @@ __all__ = [
     "ReActAgent",
     "SWEAgent",
     "ToolCallAgent",
+    "run_agents_parallel",
 ]
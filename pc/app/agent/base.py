@@ -1,13 +1,39 @@
+import asyncio
+import io
 from abc import ABC, abstractmethod
-from contextlib import asynccontextmanager
-from typing import List, Optional
+from typing import List, Optional, Sequence, Union
 
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, Field
 
-from app.llm import LLM
+from app.llm import LLM, LLMCache
 from app.logger import logger
 from app.schema import ROLE_TYPE, AgentState, Memory, Message
 
+
+class _StateContext:
+    """Async context manager backing `BaseAgent.state_context`.
+
+    A plain class with `__aenter__`/`__aexit__` avoids the generator and
+    contextlib wrapper layers that `@asynccontextmanager` adds on every call.
+    """
+
+    __slots__ = ("agent", "new", "prev")
+
+    def __init__(self, agent: "BaseAgent", new_state: AgentState):
+        self.agent = agent
+        self.new = new_state
+        self.prev = None
+
+    async def __aenter__(self) -> None:
+        self.prev = self.agent.state
+        self.agent.state = self.new  # 进入上下文时切换状态
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        # 无论成功或失败，最终恢复为 previous_state；异常不被吞掉，继续向上抛出
+        self.agent.state = self.prev
+        return False
+
+
 class BaseAgent(BaseModel, ABC):
     """Abstract base class for managing agent state and execution.
 
@@ -43,20 +69,28 @@ class BaseAgent(BaseModel, ABC):
 
     duplicate_threshold: int = 2
 
+    cache_control: bool = Field(
+        default=True,
+        description="Mark the stable prompt prefix for provider-side prompt caching",
+    )
+    llm_cache: Optional[LLMCache] = Field(
+        default=None,
+        description="Serve deterministic (temperature 0) LLM calls from this cache",
+    )
+
     class Config:
         arbitrary_types_allowed = True
         extra = "allow"  # Allow extra fields for flexibility in subclasses
 
-    # 在class中定义llm、memory两个变量时，就已经做了赋值(default_factory)，而且都是LLM Memory实例
-    # initialize_agent是发生在实例初始化后执行，在实例初始化的时候llm、memory会进行赋值，所以函数中两个if都不会执行到
-    @model_validator(mode="after")
-    def initialize_agent(self) -> "BaseAgent":
-        """Initialize agent with default settings if not provided."""
-        if self.llm is None or not isinstance(self.llm, LLM):
-            self.llm = LLM(config_name=self.name.lower())
-        if not isinstance(self.memory, Memory):
-            self.memory = Memory()
-        return self
+    def fast_copy(self, **overrides) -> "BaseAgent":
+        """Shallow-copy this agent via `model_construct`, skipping validation.
+
+        Field values (memory, llm, tools, ...) are shared with the original unless
+        overridden. Only pass trusted, already-validated values here; anything from
+        outside the process must still go through `model_validate`.
+        """
+        values = {**self.__dict__, **(self.__pydantic_extra__ or {}), **overrides}
+        return type(self).model_construct(**values)
 
     # 作用：安全地切换代理状态，确保在代码块执行后恢复原状态（即使发生异常）。
     # 流程：
@@ -64,31 +98,24 @@ class BaseAgent(BaseModel, ABC):
     # 将状态切换为 new_state。
     # 执行 async with 块内的代码。state_context()是在run()中调用，调用的时候async with state_context()
     # 无论成功或失败，最终恢复为 previous_state。
-    @asynccontextmanager
-    async def state_context(self, new_state: AgentState):
+    def state_context(self, new_state: AgentState) -> _StateContext:
         """Context manager for safe agent state transitions. 用于安全代理状态转换的上下文管理器。
 
         Args:
             new_state: The state to transition to during the context. 在上下文中过渡到的状态。
 
-        Yields:
-            None: Allows execution within the new state. 允许在新状态下执行。
+        Returns:
+            _StateContext: Async context manager that applies the new state on
+                entry and restores the previous state on exit.
 
         Raises:
             ValueError: If the new_state is invalid.
         """
-        if not isinstance(new_state, AgentState):
+        # Enum members cannot be subclassed, so an identity check on the class is enough
+        if new_state.__class__ is not AgentState:
             raise ValueError(f"Invalid state: {new_state}")
 
-        previous_state = self.state
-        self.state = new_state # 进入上下文时切换状态
-        try:
-            yield # 在此处暂停，执行 async with 块内的代码
-        except Exception as e:
-            self.state = AgentState.ERROR  # 发生异常时切换到 ERROR 状态
-            raise e
-        finally:
-            self.state = previous_state    # 退出上下文时恢复原状态
+        return _StateContext(self, new_state)
 
     def update_memory(
         self,
@@ -108,19 +135,19 @@ class BaseAgent(BaseModel, ABC):
         Raises:
             ValueError: If the role is unsupported.
         """
-        message_map = {
-            "user": Message.user_message,
-            "system": Message.system_message,
-            "assistant": Message.assistant_message,
-            "tool": lambda content, **kw: Message.tool_message(content, **kw),
-        }
-
-        if role not in message_map:
+        # Create message with appropriate parameters based on role
+        if role == "user":
+            message = Message.user_message(content, base64_image=base64_image)
+        elif role == "system":
+            message = Message.system_message(content)
+        elif role == "assistant":
+            message = Message.assistant_message(content, base64_image=base64_image)
+        elif role == "tool":
+            message = Message.tool_message(content, base64_image=base64_image, **kwargs)
+        else:
             raise ValueError(f"Unsupported message role: {role}")
 
-        # Create message with appropriate parameters based on role
-        kwargs = {"base64_image": base64_image, **(kwargs if role == "tool" else {})}
-        self.memory.add_message(message_map[role](content, **kwargs))
+        self.memory.add_message(message)
 
     # 作用：异步执行代理的主循环，逐步完成任务。
     # 流程：
@@ -148,7 +175,9 @@ class BaseAgent(BaseModel, ABC):
         if request:
             self.update_memory("user", request)
 
-        results: List[str] = []
+        # Step results are written straight into one buffer instead of
+        # formatting a string per step and joining them at the end
+        results = io.StringIO()
         async with self.state_context(AgentState.RUNNING):
             while (
                 self.current_step < self.max_steps and self.state != AgentState.FINISHED
@@ -161,14 +190,19 @@ class BaseAgent(BaseModel, ABC):
                 if self.is_stuck():
                     self.handle_stuck_state()
 
-                results.append(f"Step {self.current_step}: {step_result}")
+                if results.tell():
+                    results.write("\n")
+                results.write(f"Step {self.current_step}: ")
+                results.write(str(step_result))
 
             if self.current_step >= self.max_steps:
                 self.current_step = 0
                 self.state = AgentState.IDLE
-                results.append(f"Terminated: Reached max steps ({self.max_steps})")
+                if results.tell():
+                    results.write("\n")
+                results.write(f"Terminated: Reached max steps ({self.max_steps})")
 
-        return "\n".join(results) if results else "No steps executed"
+        return results.getvalue() if results.tell() else "No steps executed"
 
     @abstractmethod
     async def step(self) -> str:
@@ -196,12 +230,13 @@ class BaseAgent(BaseModel, ABC):
         if not last_message.content:
             return False
 
-        # Count identical content occurrences
-        duplicate_count = sum(
-            1
-            for msg in reversed(self.memory.messages[:-1])
-            if msg.role == "assistant" and msg.content == last_message.content
+        # Count identical (or, with memory.duplicate_similarity, near-identical)
+        # content occurrences among earlier assistant messages
+        duplicate_count = self.memory.count_similar_assistant_content(
+            last_message.content
         )
+        if last_message.role == "assistant":
+            duplicate_count -= 1
 
         return duplicate_count >= self.duplicate_threshold
 
@@ -214,3 +249,38 @@ class BaseAgent(BaseModel, ABC):
     def messages(self, value: List[Message]):
         """Set the list of messages in the agent's memory."""
         self.memory.messages = value
+
+
+async def run_agents_parallel(
+    agents: Sequence[BaseAgent], prompts: Sequence[Optional[str]]
+) -> List[Union[str, BaseException]]:
+    """Run independent agents concurrently, one prompt per agent.
+
+    Each agent's LLM and tool calls are awaited, so running them together with
+    asyncio.gather makes the total wall-clock time roughly that of the slowest agent
+    rather than the sum of all of them.
+
+    Args:
+        agents: Agents to run. Each must be a distinct instance with its own memory,
+            since an agent's state, step counter and memory are not safe to share
+            between runs (note that `fast_copy` shares memory unless overridden).
+        prompts: Initial request for each agent, matched to `agents` by position.
+
+    Returns:
+        Each agent's `run` result, or the exception it raised, in input order.
+
+    Raises:
+        ValueError: If the argument lengths differ, or an agent or memory appears
+            more than once.
+    """
+    if len(agents) != len(prompts):
+        raise ValueError(f"Got {len(agents)} agents but {len(prompts)} prompts")
+    if len({id(agent) for agent in agents}) != len(agents):
+        raise ValueError("Each agent instance can only be run once at a time")
+    if len({id(agent.memory) for agent in agents}) != len(agents):
+        raise ValueError("Agents run in parallel must not share a Memory")
+
+    return await asyncio.gather(
+        *(agent.run(prompt) for agent, prompt in zip(agents, prompts)),
+        return_exceptions=True,
+    )
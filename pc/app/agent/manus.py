@@ -1,6 +1,7 @@
 import json
+from functools import lru_cache
 # 用于类型注解。Any 表示任意类型，Optional 表示一个值可以是某种类型或 None
-from typing import Any, Optional
+from typing import Any, ClassVar, Optional
 # Field，用于定义数据模型的字段及其默认值
 from pydantic import Field
 
@@ -18,6 +19,12 @@ from app.tool.file_saver import FileSaver
 from app.tool.python_execute import PythonExecute
 
 
+@lru_cache(maxsize=128)
+def _browser_state_suffix(url: str, title: str) -> str:
+    """Format the browser-state context; cached since the page often stays the same across steps."""
+    return f"\nCurrent browser state:\nURL: {url}\nTitle: {title}\n"
+
+
 class Manus(ToolCallAgent):
     """
     它是一个通用的代理，能够使用多种工具（如 Python 执行、浏览器操作、文件操作等）来解决各种任务
@@ -47,6 +54,9 @@ class Manus(ToolCallAgent):
     max_observe: int = 2000
     max_steps: int = 20
 
+    # 浏览器工具在 available_tools 中注册的名称，直接读字段默认值，不必每一步都实例化 BrowserUseTool
+    _BROWSER_TOOL_NAME: ClassVar[str] = BrowserUseTool.model_fields["name"].default
+
     # Add general-purpose tools to the tool collection 将通用工具添加到工具集合中
     # 定义类属性 available_tools，表示可用的工具集合。
     # 使用 Field 和 default_factory 动态初始化 ToolCollection，包含 PythonExecute、BrowserUseTool、FileSaver 和 Terminate 工具
@@ -62,13 +72,13 @@ class Manus(ToolCallAgent):
             return
         else:
             # 如果是特殊工具，调用 BrowserUseTool 的 cleanup 方法进行清理
-            await self.available_tools.get_tool(BrowserUseTool().name).cleanup()
+            await self.available_tools.get_tool(self._BROWSER_TOOL_NAME).cleanup()
             await super()._handle_special_tool(name, result, **kwargs)
 
     async def get_browser_state(self) -> Optional[dict]:
         """Get the current browser state for context in next steps. 获取浏览器状态以用于下一步的上下文"""
         # 从 available_tools 中获取 BrowserUseTool 工具实例
-        browser_tool = self.available_tools.get_tool(BrowserUseTool().name)
+        browser_tool = self.available_tools.get_tool(self._BROWSER_TOOL_NAME)
         if not browser_tool:
             return None
 
@@ -95,15 +105,14 @@ class Manus(ToolCallAgent):
         # Add your custom pre-processing here
         browser_state = await self.get_browser_state()
 
-        # Modify the next_step_prompt temporarily
-        original_prompt = self.next_step_prompt
+        # Attach the browser state to this step's prompt without touching next_step_prompt
         if browser_state and not browser_state.get("error"):
-            self.next_step_prompt += f"\nCurrent browser state:\nURL: {browser_state.get('url', 'N/A')}\nTitle: {browser_state.get('title', 'N/A')}\n"
+            self._next_step_suffix = _browser_state_suffix(
+                browser_state.get("url", "N/A"), browser_state.get("title", "N/A")
+            )
 
         # Call parent implementation
-        result = await super().think()
-
-        # Restore original prompt
-        self.next_step_prompt = original_prompt
-
-        return result
+        try:
+            return await super().think()
+        finally:
+            self._next_step_suffix = ""
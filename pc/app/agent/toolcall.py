@@ -1,5 +1,6 @@
+import asyncio
 import json
-from typing import Any, List, Optional, Union
+from typing import Any, List, Optional, Tuple, Union
 
 from pydantic import Field
 
@@ -32,10 +33,18 @@ class ToolCallAgent(ReActAgent):
 
     tool_calls: List[ToolCall] = Field(default_factory=list)
     _current_base64_image: Optional[str] = None
+    # Per-step context appended to next_step_prompt when building the user message,
+    # so subclasses don't have to mutate and restore next_step_prompt itself
+    _next_step_suffix: str = ""
 
     max_steps: int = 30
     max_observe: Optional[Union[int, bool]] = None
 
+    # Run the tool calls returned in a single model turn concurrently instead of one
+    # after another. Only enable when the available tools are independent of each other
+    # (no call relies on the side effects of another in the same turn).
+    parallel_tool_execution: bool = False
+
     # 1、先把next_step_prompt作为user_prompt添加到self.messages
     # 2、把self.messages作为参数、两个工具作为参数，调用self.llm.ask_tool得到对tool使用的输出
     # 3、如果调用tool不为空：往self.memory中加进去调用tool的记录（role是assistant）；如果为空：往self.memory中加进去普通的content（role是assistant）
@@ -43,13 +52,17 @@ class ToolCallAgent(ReActAgent):
     async def think(self) -> bool:
         """Process current state and decide next actions using tools"""
         if self.next_step_prompt:
-            user_msg = Message.user_message(self.next_step_prompt)
+            user_msg = Message.user_message(
+                self.next_step_prompt + self._next_step_suffix
+                if self._next_step_suffix
+                else self.next_step_prompt
+            )
             self.messages += [user_msg]
 
         try:
             # Get response with tool options
             response = await self.llm.ask_tool(
-                messages=self.messages,
+                messages=self.memory.to_dict_list(),
                 system_msgs=(
                     [Message.system_message(self.system_prompt)]
                     if self.system_prompt
@@ -57,6 +70,9 @@ class ToolCallAgent(ReActAgent):
                 ),
                 tools=self.available_tools.to_params(),
                 tool_choice=self.tool_choices,
+                cache_control=self.cache_control,
+                response_cache=self.llm_cache,
+                history_tokens=self.memory.count_tokens(self.llm.count_message),
             )
         except ValueError:
             raise
@@ -145,13 +161,16 @@ class ToolCallAgent(ReActAgent):
             # Return last message content if no tool calls
             return self.messages[-1].content or "No content or commands to execute"
 
-        results = []
-        for command in self.tool_calls:
-            # Reset base64_image for each tool call
-            self._current_base64_image = None
-
-            result = await self.execute_tool(command)
+        if self.parallel_tool_execution and len(self.tool_calls) > 1:
+            outcomes = await asyncio.gather(
+                *(self.execute_tool(command) for command in self.tool_calls)
+            )
+        else:
+            outcomes = [await self.execute_tool(command) for command in self.tool_calls]
 
+        # Fold results back into memory in the order the model issued the calls
+        results = []
+        for command, (result, base64_image) in zip(self.tool_calls, outcomes):
             if self.max_observe:
                 result = result[: self.max_observe]
 
@@ -164,21 +183,26 @@ class ToolCallAgent(ReActAgent):
                 content=result,
                 tool_call_id=command.id,
                 name=command.function.name,
-                base64_image=self._current_base64_image,
+                base64_image=base64_image,
             )
             self.memory.add_message(tool_msg)
             results.append(result)
 
         return "\n\n".join(results)
 
-    async def execute_tool(self, command: ToolCall) -> str:
-        """Execute a single tool call with robust error handling"""
+    async def execute_tool(self, command: ToolCall) -> Tuple[str, Optional[str]]:
+        """Execute a single tool call with robust error handling.
+
+        Returns the observation together with the tool's base64 image (if any). The
+        image is returned rather than stored on the agent, so calls running
+        concurrently never read each other's screenshots.
+        """
         if not command or not command.function or not command.function.name:
-            return "Error: Invalid command format"
+            return "Error: Invalid command format", None
 
         name = command.function.name
         if name not in self.available_tools.tool_map:
-            return f"Error: Unknown tool '{name}'"
+            return f"Error: Unknown tool '{name}'", None
 
         try:
             # Parse arguments
@@ -191,37 +215,27 @@ class ToolCallAgent(ReActAgent):
             # Handle special tools
             await self._handle_special_tool(name=name, result=result)
 
-            # Check if result is a ToolResult with base64_image
-            if hasattr(result, "base64_image") and result.base64_image:
-                # Store the base64_image for later use in tool_message
-                self._current_base64_image = result.base64_image
-
-                # Format result for display
-                observation = (
-                    f"Observed output of cmd `{name}` executed:\n{str(result)}"
-                    if result
-                    else f"Cmd `{name}` completed with no output"
-                )
-                return observation
+            # The base64_image of a ToolResult (if any), for use in tool_message
+            base64_image = getattr(result, "base64_image", None) or None
 
-            # Format result for display (standard case)
+            # Format result for display
             observation = (
                 f"Observed output of cmd `{name}` executed:\n{str(result)}"
                 if result
                 else f"Cmd `{name}` completed with no output"
             )
 
-            return observation
+            return observation, base64_image
         except json.JSONDecodeError:
             error_msg = f"Error parsing arguments for {name}: Invalid JSON format"
             logger.error(
                 f"📝 Oops! The arguments for '{name}' don't make sense - invalid JSON, arguments:{command.function.arguments}"
             )
-            return f"Error: {error_msg}"
+            return f"Error: {error_msg}", None
         except Exception as e:
             error_msg = f"⚠️ Tool '{name}' encountered a problem: {str(e)}"
             logger.error(error_msg)
-            return f"Error: {error_msg}"
+            return f"Error: {error_msg}", None
 
     async def _handle_special_tool(self, name: str, result: Any, **kwargs):
         """Handle special tool execution and state changes"""
@@ -28,6 +28,9 @@ class LLMSettings(BaseModel):
     temperature: float = Field(1.0, description="Sampling temperature")
     api_type: str = Field(..., description="AzureOpenai or Openai")
     api_version: str = Field(..., description="Azure Openai version if AzureOpenai")
+    max_concurrency: int = Field(
+        8, ge=1, description="Maximum number of concurrent requests to this LLM"
+    )
 
 
 class ProxySettings(BaseModel):
@@ -132,6 +135,7 @@ class Config:
             "temperature": base_llm.get("temperature", 1.0),
             "api_type": base_llm.get("api_type", ""),
             "api_version": base_llm.get("api_version", ""),
+            "max_concurrency": base_llm.get("max_concurrency", 8),
         }
 
         # handle browser config.
@@ -1,12 +1,18 @@
+import asyncio
+import hashlib
+import importlib.util
+import json
 import math
 from typing import Dict, List, Optional, Union
 
+import httpx
 import tiktoken
 from openai import (
     APIError,
     AsyncAzureOpenAI,
     AsyncOpenAI,
     AuthenticationError,
+    DefaultAsyncHttpxClient,
     OpenAIError,
     RateLimitError,
 )
@@ -28,9 +34,30 @@ from app.schema import (
     ToolChoice,
 )
 
+try:
+    # Optional: only needed when an LLMCache is used
+    import diskcache
+except ImportError:
+    diskcache = None
+
 
 REASONING_MODELS = ["o1", "o3-mini"]
 
+# HTTP/2 lets concurrent requests share one connection, but needs the optional `h2` package
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _shared_http_client() -> httpx.AsyncClient:
+    """Process-wide pooled HTTP client shared by every LLM instance"""
+    global _http_client
+    if _http_client is None:
+        _http_client = DefaultAsyncHttpxClient(
+            http2=_HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        )
+    return _http_client
+
 
 class TokenCounter:
     # Token constants
@@ -146,26 +173,66 @@ class TokenCounter:
         total_tokens = self.FORMAT_TOKENS  # Base format tokens
 
         for message in messages:
-            tokens = self.BASE_MESSAGE_TOKENS  # Base tokens per message
+            total_tokens += self.count_single_message(message)
 
-            # Add role tokens
-            tokens += self.count_text(message.get("role", ""))
+        return total_tokens
 
-            # Add content tokens
-            if "content" in message:
-                tokens += self.count_content(message["content"])
+    def count_single_message(self, message: dict) -> int:
+        """Calculate the number of tokens in one formatted message"""
+        tokens = self.BASE_MESSAGE_TOKENS  # Base tokens per message
 
-            # Add tool calls tokens
-            if "tool_calls" in message:
-                tokens += self.count_tool_calls(message["tool_calls"])
+        # Add role tokens
+        tokens += self.count_text(message.get("role", ""))
 
-            # Add name and tool_call_id tokens
-            tokens += self.count_text(message.get("name", ""))
-            tokens += self.count_text(message.get("tool_call_id", ""))
+        # Add content tokens
+        if "content" in message:
+            tokens += self.count_content(message["content"])
 
-            total_tokens += tokens
+        # Add tool calls tokens
+        if "tool_calls" in message:
+            tokens += self.count_tool_calls(message["tool_calls"])
 
-        return total_tokens
+        # Add name and tool_call_id tokens
+        tokens += self.count_text(message.get("name", ""))
+        tokens += self.count_text(message.get("tool_call_id", ""))
+
+        return tokens
+
+
+class LLMCache:
+    """Disk-backed exact-match cache of LLM responses (requires `diskcache`).
+
+    Only deterministic requests (temperature ~ 0) are looked up or stored, since
+    sampled responses are not meant to be replayed.
+    """
+
+    def __init__(self, directory: str):
+        if diskcache is None:
+            raise ImportError(
+                "diskcache is required for LLMCache, "
+                "install it with `pip install diskcache`"
+            )
+        self._cache = diskcache.Cache(directory)
+
+    @staticmethod
+    def cacheable(params: dict) -> bool:
+        temperature = params.get("temperature")
+        return temperature is not None and temperature < 1e-6
+
+    @staticmethod
+    def key(params: dict) -> str:
+        """Hash of everything in the request that affects the response"""
+        payload = {k: v for k, v in params.items() if k != "timeout"}
+        canonical = json.dumps(
+            payload, sort_keys=True, separators=(",", ":"), default=str
+        )
+        return hashlib.blake2b(canonical.encode("utf-8"), digest_size=32).hexdigest()
+
+    def get(self, key: str):
+        return self._cache.get(key)
+
+    def set(self, key: str, value) -> None:
+        self._cache.set(key, value)
 
 
 class LLM:
@@ -197,8 +264,23 @@ class LLM:
             self.api_version = llm_config.api_version
             self.base_url = llm_config.base_url
 
+            # Cap on requests in flight through this instance, shared by every agent using it
+            self.max_concurrency = getattr(llm_config, "max_concurrency", 8)
+            self._semaphore: Optional[asyncio.Semaphore] = None
+            self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+
+            # Anthropic endpoints only reuse a cached prompt prefix at explicit
+            # `cache_control` breakpoints; other providers cache prefixes automatically
+            self.supports_cache_control = (
+                self.api_type == "anthropic" or "anthropic" in self.base_url.lower()
+            )
+
             # Add token counting related attributes
             self.total_input_tokens = 0
+            self.total_cached_tokens = 0
+            # Token counts of system messages by (role, content); system prompts are
+            # constant per agent, so they only need to be tokenized once
+            self._system_token_counts: Dict[tuple, int] = {}
             self.max_input_tokens = (
                 llm_config.max_input_tokens
                 if hasattr(llm_config, "max_input_tokens")
@@ -218,12 +300,47 @@ class LLM:
                     base_url=self.base_url,
                     api_key=self.api_key,
                     api_version=self.api_version,
+                    http_client=_shared_http_client(),
                 )
             else:
-                self.client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+                self.client = AsyncOpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    http_client=_shared_http_client(),
+                )
 
             self.token_counter = TokenCounter(self.tokenizer)
 
+    def _request_slot(self) -> asyncio.Semaphore:
+        """Semaphore bounding concurrent requests, created lazily for the running loop"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def _create_completion(self, params: dict):
+        """Send a non-streaming completion request within the concurrency limit"""
+        async with self._request_slot():
+            return await self.client.chat.completions.create(**params)
+
+    async def _stream_completion(self, params: dict) -> str:
+        """Send a streaming completion request and collect the streamed text.
+
+        The concurrency slot is held until the stream is fully consumed.
+        """
+        async with self._request_slot():
+            response = await self.client.chat.completions.create(**params)
+
+            collected_messages = []
+            async for chunk in response:
+                chunk_message = chunk.choices[0].delta.content or ""
+                collected_messages.append(chunk_message)
+                print(chunk_message, end="", flush=True)
+
+        print()  # Newline after streaming
+        return "".join(collected_messages).strip()
+
     def count_tokens(self, text: str) -> int:
         """Calculate the number of tokens in a text"""
         if not text:
@@ -233,14 +350,82 @@ class LLM:
     def count_message_tokens(self, messages: List[dict]) -> int:
         return self.token_counter.count_message_tokens(messages)
 
-    def update_token_count(self, input_tokens: int) -> None:
+    def count_system_tokens(self, system_msgs: List[dict]) -> int:
+        """Tokens of formatted system messages, plus the per-request format tokens"""
+        tokens = self.token_counter.FORMAT_TOKENS
+        for message in system_msgs:
+            content = message.get("content")
+            if not isinstance(content, str) or len(message) != 2:
+                tokens += self.token_counter.count_single_message(message)
+                continue
+            key = (message["role"], content)
+            count = self._system_token_counts.get(key)
+            if count is None:
+                count = self.token_counter.count_single_message(message)
+                self._system_token_counts[key] = count
+            tokens += count
+        return tokens
+
+    def count_message(self, message: dict) -> int:
+        """Tokens one message contributes to a request, as it will be formatted"""
+        formatted = self.format_messages([message])
+        return self.token_counter.count_single_message(formatted[0]) if formatted else 0
+
+    def update_token_count(self, input_tokens: int, cached_tokens: int = 0) -> None:
         """Update token counts"""
         # Only track tokens if max_input_tokens is set
         self.total_input_tokens += input_tokens
+        self.total_cached_tokens += cached_tokens
         logger.info(
             f"Token usage: Input={input_tokens}, Cumulative Input={self.total_input_tokens}"
+            + (
+                f", Cached={cached_tokens}, Cumulative Cached={self.total_cached_tokens}"
+                if cached_tokens
+                else ""
+            )
         )
 
+    @staticmethod
+    def cached_prompt_tokens(usage) -> int:
+        """Read the number of prompt tokens served from the provider's prompt cache"""
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) if details else None
+        if cached is None:
+            # Anthropic reports cache hits under its own field name
+            cached = getattr(usage, "cache_read_input_tokens", None)
+        return cached or 0
+
+    @staticmethod
+    def mark_cache_breakpoints(messages: List[dict]) -> List[dict]:
+        """Tag the stable prompt prefix with `cache_control` breakpoints.
+
+        Marks the last system message and the message just before the newest one,
+        so the provider can reuse everything up to that point on the next turn.
+        The input list and its dicts are left unmodified.
+
+        Args:
+            messages: Formatted messages, as returned by `format_messages`
+
+        Returns:
+            List[dict]: The messages with breakpoints added
+        """
+        marked = list(messages)
+        system_indexes = [i for i, msg in enumerate(marked) if msg["role"] == "system"]
+        indexes = {len(marked) - 2} | set(system_indexes[-1:])
+        for i in indexes:
+            if i < 0:
+                continue
+            content = marked[i].get("content")
+            if isinstance(content, str) and content:
+                content = [{"type": "text", "text": content}]
+            elif not (isinstance(content, list) and content):
+                continue
+            content = list(content)
+            if isinstance(content[-1], dict):
+                content[-1] = {**content[-1], "cache_control": {"type": "ephemeral"}}
+                marked[i] = {**marked[i], "content": content}
+        return marked
+
     def check_token_limit(self, input_tokens: int) -> bool:
         """Check if token limits are exceeded"""
         if self.max_input_tokens is not None:
@@ -259,12 +444,15 @@ class LLM:
         return "Token limit exceeded"
 
     @staticmethod
-    def format_messages(messages: List[Union[dict, Message]]) -> List[dict]:
+    def format_messages(
+        messages: List[Union[dict, Message]], out: Optional[List[dict]] = None
+    ) -> List[dict]:
         """
         Format messages for LLM by converting them to OpenAI message format.
 
         Args:
             messages: List of messages that can be either dict or Message objects
+            out: Already formatted messages to append to; a new list is used if None
 
         Returns:
             List[dict]: List of formatted messages in OpenAI format
@@ -281,7 +469,7 @@ class LLM:
             ... ]
             >>> formatted = LLM.format_messages(msgs)
         """
-        formatted_messages = []
+        formatted_messages = [] if out is None else out
 
         for message in messages:
             # Convert Message objects to dictionaries
@@ -297,6 +485,8 @@ class LLM:
 
             # Process base64 images if present
             if message.get("base64_image"):
+                # Work on a copy so caller-owned dicts (e.g. Memory's rendered history) stay intact
+                message = dict(message)
                 # Initialize or convert content to appropriate format
                 if not message.get("content"):
                     message["content"] = []
@@ -375,7 +565,9 @@ class LLM:
             # Format system and user messages
             if system_msgs:
                 system_msgs = self.format_messages(system_msgs)
-                messages = system_msgs + self.format_messages(messages)
+                # Format the history straight onto the system list instead of
+                # building it separately and concatenating
+                messages = self.format_messages(messages, out=system_msgs)
             else:
                 messages = self.format_messages(messages)
 
@@ -405,13 +597,16 @@ class LLM:
                 # Non-streaming request
                 params["stream"] = False
 
-                response = await self.client.chat.completions.create(**params)
+                response = await self._create_completion(params)
 
                 if not response.choices or not response.choices[0].message.content:
                     raise ValueError("Empty or invalid response from LLM")
 
                 # Update token counts
-                self.update_token_count(response.usage.prompt_tokens)
+                self.update_token_count(
+                    response.usage.prompt_tokens,
+                    self.cached_prompt_tokens(response.usage),
+                )
 
                 return response.choices[0].message.content
 
@@ -419,16 +614,7 @@ class LLM:
             self.update_token_count(input_tokens)
 
             params["stream"] = True
-            response = await self.client.chat.completions.create(**params)
-
-            collected_messages = []
-            async for chunk in response:
-                chunk_message = chunk.choices[0].delta.content or ""
-                collected_messages.append(chunk_message)
-                print(chunk_message, end="", flush=True)
-
-            print()  # Newline after streaming
-            full_response = "".join(collected_messages).strip()
+            full_response = await self._stream_completion(params)
             if not full_response:
                 raise ValueError("Empty response from streaming LLM")
 
@@ -498,14 +684,15 @@ class LLM:
                 )
 
             # Process the last user message to include images
-            last_message = formatted_messages[-1]
+            # (copied first, the formatted dict may be shared with the caller)
+            last_message = formatted_messages[-1] = dict(formatted_messages[-1])
 
             # Convert content to multimodal format if needed
             content = last_message["content"]
             multimodal_content = (
                 [{"type": "text", "text": content}]
                 if isinstance(content, str)
-                else content
+                else list(content)
                 if isinstance(content, list)
                 else []
             )
@@ -555,26 +742,20 @@ class LLM:
 
             # Handle non-streaming request
             if not stream:
-                response = await self.client.chat.completions.create(**params)
+                response = await self._create_completion(params)
 
                 if not response.choices or not response.choices[0].message.content:
                     raise ValueError("Empty or invalid response from LLM")
 
-                self.update_token_count(response.usage.prompt_tokens)
+                self.update_token_count(
+                    response.usage.prompt_tokens,
+                    self.cached_prompt_tokens(response.usage),
+                )
                 return response.choices[0].message.content
 
             # Handle streaming request
             self.update_token_count(input_tokens)
-            response = await self.client.chat.completions.create(**params)
-
-            collected_messages = []
-            async for chunk in response:
-                chunk_message = chunk.choices[0].delta.content or ""
-                collected_messages.append(chunk_message)
-                print(chunk_message, end="", flush=True)
-
-            print()  # Newline after streaming
-            full_response = "".join(collected_messages).strip()
+            full_response = await self._stream_completion(params)
 
             if not full_response:
                 raise ValueError("Empty response from streaming LLM")
@@ -614,6 +795,9 @@ class LLM:
         tools: Optional[List[dict]] = None,
         tool_choice: TOOL_CHOICE_TYPE = ToolChoice.AUTO,  # type: ignore
         temperature: Optional[float] = None,
+        cache_control: bool = False,
+        response_cache: Optional[LLMCache] = None,
+        history_tokens: Optional[int] = None,
         **kwargs,
     ):
         """
@@ -626,6 +810,13 @@ class LLM:
             tools: List of tools to use
             tool_choice: Tool choice strategy
             temperature: Sampling temperature for the response
+            cache_control: Mark the stable prompt prefix for prompt caching on
+                providers that need explicit breakpoints (Anthropic)
+            response_cache: Cache to serve and store deterministic (temperature 0)
+                responses from
+            history_tokens: Precomputed token count of `messages` (as returned by
+                `Memory.count_tokens(self.count_message)`), so the history is not
+                re-tokenized on every call
             **kwargs: Additional completion arguments
 
         Returns:
@@ -645,12 +836,18 @@ class LLM:
             # Format messages
             if system_msgs:
                 system_msgs = self.format_messages(system_msgs)
-                messages = system_msgs + self.format_messages(messages)
+                # system_msgs is reused for count_system_tokens below, so extend a copy
+                messages = self.format_messages(messages, out=list(system_msgs))
             else:
                 messages = self.format_messages(messages)
 
             # Calculate input token count
-            input_tokens = self.count_message_tokens(messages)
+            if history_tokens is None:
+                input_tokens = self.count_message_tokens(messages)
+            else:
+                input_tokens = (
+                    self.count_system_tokens(system_msgs or []) + history_tokens
+                )
 
             # If there are tools, calculate token count for tool descriptions
             tools_tokens = 0
@@ -672,6 +869,9 @@ class LLM:
                     if not isinstance(tool, dict) or "type" not in tool:
                         raise ValueError("Each tool must be a dict with 'type' field")
 
+            if cache_control and self.supports_cache_control:
+                messages = self.mark_cache_breakpoints(messages)
+
             # Set up the completion request
             params = {
                 "model": self.model,
@@ -690,7 +890,16 @@ class LLM:
                     temperature if temperature is not None else self.temperature
                 )
 
-            response = await self.client.chat.completions.create(**params)
+            cache_key = None
+            if response_cache is not None and LLMCache.cacheable(params):
+                cache_key = LLMCache.key(params)
+                cached = response_cache.get(cache_key)
+                if cached is not None:
+                    message, prompt_tokens = cached
+                    logger.info(f"LLM cache hit, {prompt_tokens} prompt tokens saved")
+                    return message
+
+            response = await self._create_completion(params)
 
             # Check if response is valid
             if not response.choices or not response.choices[0].message:
@@ -698,7 +907,16 @@ class LLM:
                 raise ValueError("Invalid or empty response from LLM")
 
             # Update token counts
-            self.update_token_count(response.usage.prompt_tokens)
+            self.update_token_count(
+                response.usage.prompt_tokens,
+                self.cached_prompt_tokens(response.usage),
+            )
+
+            if cache_key is not None:
+                response_cache.set(
+                    cache_key,
+                    (response.choices[0].message, response.usage.prompt_tokens),
+                )
 
             return response.choices[0].message
 
@@ -1,7 +1,17 @@
-from enum import Enum
-from typing import Any, List, Literal, Optional, Union
+from array import array
+from collections import Counter
+from enum import Enum, IntEnum
+from itertools import islice
+from typing import Any, Callable, Dict, List, Literal, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
+
+
+try:
+    # Optional: only needed when Memory.duplicate_similarity is set
+    from datasketch import MinHash, MinHashLSH
+except ImportError:
+    MinHash = MinHashLSH = None
 
 
 class Role(str, Enum):
@@ -29,13 +39,17 @@ TOOL_CHOICE_VALUES = tuple(choice.value for choice in ToolChoice)
 TOOL_CHOICE_TYPE = Literal[TOOL_CHOICE_VALUES]  # type: ignore
 
 
-class AgentState(str, Enum):
+class AgentState(IntEnum):
     """Agent execution states"""
 
-    IDLE = "IDLE"
-    RUNNING = "RUNNING"
-    FINISHED = "FINISHED"
-    ERROR = "ERROR"
+    # int-valued so the state checks in the step loop are plain int compares
+    IDLE = 0
+    RUNNING = 1
+    FINISHED = 2
+    ERROR = 3
+
+    def __str__(self) -> str:
+        return self.name
 
 
 class Function(BaseModel):
@@ -156,16 +170,114 @@ class Message(BaseModel):
         )
 
 
+def _shingles(content: str) -> set:
+    """Split text into 5-token windows, or 3-char windows for short text"""
+    tokens = content.split()
+    if len(tokens) >= 5:
+        return {" ".join(tokens[i : i + 5]) for i in range(len(tokens) - 4)}
+    if len(content) >= 3:
+        return {content[i : i + 3] for i in range(len(content) - 2)}
+    return {content}
+
+
+class _MessageList(list):
+    """List of messages that counts its own mutations.
+
+    `version` is bumped by every mutation except appending at the end (append,
+    extend, +=), which lets Memory extend its indexes incrementally on appends and
+    rebuild them after anything else.
+    """
+
+    __slots__ = ("version",)
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.version = 0
+
+    def _rewrite(method):
+        def wrapper(self, *args):
+            self.version += 1
+            return method(self, *args)
+
+        wrapper.__name__ = method.__name__
+        return wrapper
+
+    insert = _rewrite(list.insert)
+    remove = _rewrite(list.remove)
+    pop = _rewrite(list.pop)
+    clear = _rewrite(list.clear)
+    reverse = _rewrite(list.reverse)
+    __setitem__ = _rewrite(list.__setitem__)
+    __delitem__ = _rewrite(list.__delitem__)
+    __imul__ = _rewrite(list.__imul__)
+    del _rewrite
+
+    def sort(self, *args, **kwargs):
+        self.version += 1
+        super().sort(*args, **kwargs)
+
+
 class Memory(BaseModel):
+    # Always held as a _MessageList (see __setattr__), so edits made directly on
+    # `messages` are noticed by the indexes below
     messages: List[Message] = Field(default_factory=list)
     max_messages: int = Field(default=100)
+    # Estimated Jaccard similarity at which assistant messages count as duplicates
+    # (MinHash + LSH, requires `datasketch`); None keeps exact-match detection
+    duplicate_similarity: Optional[float] = Field(default=None)
+
+    # Dict form of each message in `messages`, rendered once when the message is added
+    # so the serialized history is only ever extended (keeps the prompt prefix stable)
+    _rendered: List[dict] = PrivateAttr(default_factory=list)
+    # Snapshot handed out by to_dict_list(), dropped whenever `_rendered` changes
+    _dict_list: Optional[List[dict]] = PrivateAttr(default=None)
+    # Token count of each rendered message, filled lazily by count_tokens() and
+    # kept as a flat array parallel to `_rendered` for cheap slicing and summing
+    _token_counts: array = PrivateAttr(default_factory=lambda: array("I"))
+    _token_counter: Optional[Callable[[dict], int]] = PrivateAttr(default=None)
+    # Occurrence count of each assistant message content currently in `messages`,
+    # kept incrementally so duplicate detection does not rescan the history
+    _assistant_counts: Counter = PrivateAttr(default_factory=Counter)
+    _indexed_messages: Optional[List[Message]] = PrivateAttr(default=None)
+    _indexed_len: int = PrivateAttr(default=0)
+    _indexed_version: int = PrivateAttr(default=0)
+    # Near-duplicate index over the same assistant messages, used when duplicate_similarity is set
+    _similar_index: Any = PrivateAttr(default=None)
+    _similar_keys: Dict[int, List[int]] = PrivateAttr(default_factory=dict)
+    _similar_seq: int = PrivateAttr(default=0)
+
+    def model_post_init(self, __context: Any) -> None:
+        self.messages = self.messages  # wrap in a _MessageList
+        if self.duplicate_similarity is not None and MinHashLSH is None:
+            raise ImportError(
+                "datasketch is required for Memory.duplicate_similarity, "
+                "install it with `pip install datasketch`"
+            )
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name == "messages" and value.__class__ is not _MessageList:
+            value = _MessageList(value)
+        super().__setattr__(name, value)
 
     def add_message(self, message: Message) -> None:
         """Add a message to memory"""
+        self._sync_index()
         self.messages.append(message)
+        self._index_message(message)
+        self._indexed_len += 1
         # Optional: Implement message limit
         if len(self.messages) > self.max_messages:
-            self.messages = self.messages[-self.max_messages :]
+            n_dropped = len(self.messages) - self.max_messages
+            for dropped in self.messages[:n_dropped]:
+                self._unindex_message(dropped)
+            self.messages = _MessageList(islice(self.messages, n_dropped, None))
+            self._rendered = self._rendered[n_dropped:]
+            # Token counts may lag behind `_rendered`, so drop from the front too
+            self._token_counts = self._token_counts[n_dropped:]
+            self._dict_list = None
+            self._indexed_messages = self.messages
+            self._indexed_len = len(self.messages)
+            self._indexed_version = self.messages.version
 
     def add_messages(self, messages: List[Message]) -> None:
         """Add multiple messages to memory"""
@@ -174,11 +286,133 @@ class Memory(BaseModel):
     def clear(self) -> None:
         """Clear all messages"""
         self.messages.clear()
+        self._reset_index()
 
     def get_recent_messages(self, n: int) -> List[Message]:
         """Get n most recent messages"""
         return self.messages[-n:]
 
+    def snapshot(self) -> "Memory":
+        """Independent copy of this memory, e.g. to explore a branch and discard it.
+
+        Messages and their rendered dicts are shared instead of deep-copied, as they
+        are never modified once added; only the list and the indexes are copied, so
+        the branch doesn't re-render or re-tokenize the history.
+        """
+        self._sync_index()
+        branch = Memory.model_construct(
+            messages=_MessageList(self.messages),
+            max_messages=self.max_messages,
+            duplicate_similarity=self.duplicate_similarity,
+        )
+        branch._rendered = list(self._rendered)
+        branch._dict_list = self._dict_list
+        branch._token_counts = array("I", self._token_counts)
+        branch._token_counter = self._token_counter
+        branch._assistant_counts = Counter(self._assistant_counts)
+        branch._indexed_messages = branch.messages
+        branch._indexed_len = len(branch.messages)
+        branch._indexed_version = branch.messages.version
+        # The LSH index can't be copied cheaply; the branch rebuilds it on first use
+        return branch
+
     def to_dict_list(self) -> List[dict]:
-        """Convert messages to list of dicts"""
-        return [msg.to_dict() for msg in self.messages]
+        """Convert messages to list of dicts.
+
+        The list is cached until memory changes, and both it and its dicts are shared
+        between calls, so treat them as read-only.
+        """
+        self._sync_index()
+        if self._dict_list is None:
+            self._dict_list = list(self._rendered)
+        return self._dict_list
+
+    def count_tokens(self, counter: Callable[[dict], int]) -> int:
+        """Total tokens of all messages, as measured by `counter` on each rendered dict.
+
+        Each message is only measured once; switching to a different counter
+        re-measures everything. The counts are rebuilt together with the rendered
+        dicts whenever `_sync_index` resets, so they always describe the same
+        history that to_dict_list() returns.
+        """
+        self._sync_index()
+        if counter != self._token_counter or len(self._token_counts) > len(
+            self._rendered
+        ):
+            self._token_counter = counter
+            self._token_counts = array("I")
+        counts = self._token_counts
+        for i in range(len(counts), len(self._rendered)):
+            counts.append(counter(self._rendered[i]))
+        return sum(counts)
+
+    def count_assistant_content(self, content: str) -> int:
+        """Count assistant messages in memory whose content equals `content`"""
+        self._sync_index()
+        return self._assistant_counts[content]
+
+    def count_similar_assistant_content(self, content: str) -> int:
+        """Count assistant messages in memory whose content is a near-duplicate of `content`.
+
+        Falls back to exact matching when duplicate_similarity is not set.
+        """
+        if self.duplicate_similarity is None:
+            return self.count_assistant_content(content)
+        self._sync_index()
+        return len(self._similar_index.query(self._minhash(content)))
+
+    def _minhash(self, content: str) -> "MinHash":
+        minhash = MinHash(num_perm=64)
+        for shingle in _shingles(content):
+            minhash.update(shingle.encode("utf-8"))
+        return minhash
+
+    def _index_message(self, message: Message) -> None:
+        self._rendered.append(message.to_dict())
+        self._dict_list = None
+        if message.role == Role.ASSISTANT and message.content:
+            self._assistant_counts[message.content] += 1
+            if self.duplicate_similarity is not None:
+                self._similar_seq += 1
+                self._similar_index.insert(
+                    self._similar_seq, self._minhash(message.content)
+                )
+                self._similar_keys.setdefault(id(message), []).append(self._similar_seq)
+
+    def _unindex_message(self, message: Message) -> None:
+        if message.role == Role.ASSISTANT and message.content:
+            self._assistant_counts[message.content] -= 1
+            if self._assistant_counts[message.content] <= 0:
+                del self._assistant_counts[message.content]
+            if self.duplicate_similarity is not None:
+                keys = self._similar_keys[id(message)]
+                self._similar_index.remove(keys.pop(0))
+                if not keys:
+                    del self._similar_keys[id(message)]
+
+    def _reset_index(self) -> None:
+        self._rendered = []
+        self._dict_list = None
+        self._token_counts = array("I")
+        self._assistant_counts.clear()
+        self._indexed_len = 0
+        if self.duplicate_similarity is not None:
+            self._similar_index = MinHashLSH(
+                threshold=self.duplicate_similarity, num_perm=64
+            )
+            self._similar_keys.clear()
+
+    def _sync_index(self) -> None:
+        """Fold in messages that were appended to or replaced on `messages` directly"""
+        messages = self.messages
+        if (
+            messages is not self._indexed_messages
+            or messages.version != self._indexed_version
+            or (self.duplicate_similarity is not None and self._similar_index is None)
+        ):
+            self._reset_index()
+            self._indexed_messages = messages
+            self._indexed_version = messages.version
+        for i in range(self._indexed_len, len(messages)):
+            self._index_message(messages[i])
+        self._indexed_len = len(messages)
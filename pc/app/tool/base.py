@@ -1,7 +1,9 @@
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from dataclasses import replace as dataclass_replace
 from typing import Any, Dict, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, PrivateAttr
 
 
 class BaseTool(ABC, BaseModel):
@@ -9,9 +11,17 @@ class BaseTool(ABC, BaseModel):
     description: str
     parameters: Optional[dict] = None
 
+    # Function-call format built by to_param(), reset whenever one of its source fields is reassigned
+    _param_cache: Optional[Dict] = PrivateAttr(default=None)
+
     class Config:
         arbitrary_types_allowed = True
 
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name in ("name", "description", "parameters"):
+            self._param_cache = None
+
     async def __call__(self, **kwargs) -> Any:
         """Execute the tool with given parameters."""
         return await self.execute(**kwargs)
@@ -21,46 +31,60 @@ class BaseTool(ABC, BaseModel):
         """Execute the tool with given parameters."""
 
     def to_param(self) -> Dict:
-        """Convert tool to function call format."""
-        return {
-            "type": "function",
-            "function": {
-                "name": self.name,
-                "description": self.description,
-                "parameters": self.parameters,
-            },
-        }
-
-
-class ToolResult(BaseModel):
-    """Represents the result of a tool execution."""
-
-    output: Any = Field(default=None)
-    error: Optional[str] = Field(default=None)
-    base64_image: Optional[str] = Field(default=None)
-    system: Optional[str] = Field(default=None)
-
-    class Config:
-        arbitrary_types_allowed = True
+        """Convert tool to function call format.
+
+        The result is built once and shared between calls, so treat it as read-only.
+        """
+        if self._param_cache is None:
+            self._param_cache = {
+                "type": "function",
+                "function": {
+                    "name": self.name,
+                    "description": self.description,
+                    "parameters": self.parameters,
+                },
+            }
+        return self._param_cache
+
+
+@dataclass(slots=True)
+class ToolResult:
+    """Represents the result of a tool execution.
+
+    A slotted dataclass rather than a pydantic model: results are created on every
+    tool call and combined with `+`, and need no validation.
+    """
+
+    output: Any = None
+    error: Optional[str] = None
+    base64_image: Optional[str] = None
+    system: Optional[str] = None
 
     def __bool__(self):
-        return any(getattr(self, field) for field in self.__fields__)
+        return bool(self.output or self.error or self.base64_image or self.system)
 
     def __add__(self, other: "ToolResult"):
-        def combine_fields(
-            field: Optional[str], other_field: Optional[str], concatenate: bool = True
-        ):
-            if field and other_field:
-                if concatenate:
-                    return field + other_field
-                raise ValueError("Cannot combine tool results") # 抛出 ValueError 异常，中断程序
-            return field or other_field
+        # 两边都有值时拼接，否则取有值的一边；base64_image 不能拼接
+        if self.base64_image and other.base64_image:
+            # 抛出 ValueError 异常，中断程序
+            raise ValueError("Cannot combine tool results")
 
+        output, error, system = self.output, self.error, self.system
         return ToolResult(
-            output=combine_fields(self.output, other.output),
-            error=combine_fields(self.error, other.error),
-            base64_image=combine_fields(self.base64_image, other.base64_image, False),
-            system=combine_fields(self.system, other.system),
+            output=(
+                output + other.output
+                if output and other.output
+                else output or other.output
+            ),
+            error=(
+                error + other.error if error and other.error else error or other.error
+            ),
+            base64_image=self.base64_image or other.base64_image,
+            system=(
+                system + other.system
+                if system and other.system
+                else system or other.system
+            ),
         )
 
     def __str__(self):
@@ -68,20 +92,17 @@ class ToolResult(BaseModel):
 
     # 作用：返回一个新的对象（ToolResult 实例），并将当前对象的字段与传入的 kwargs 参数合并。
     # 如果 kwargs 中有与当前对象字段同名的参数，则使用 kwargs 中的值覆盖当前对象的值。
-    # 返回值：返回一个新的对象，类型与当前对象相同（通过 type(self) 获取）
+    # 返回值：返回一个新的对象，类型与当前对象相同（dataclasses.replace 会保留 type(self)）
     def replace(self, **kwargs):
         """Returns a new ToolResult with the given fields replaced."""
-        # type(self) 获取当前对象的类（即 ToolResult）
-        # 通过 type(self)(...) 创建一个新的 ToolResult 实例
-
-        # self.dict() 将当前对象的字段和值转换为字典，例如，如果 self 是 ToolResult(name="tool1", value=10)，则 self.dict() 返回：
-        # {"name": "tool1", "value": 10}
-        return type(self)(**{**self.dict(), **kwargs})
+        return dataclass_replace(self, **kwargs)
 
 
+@dataclass(slots=True)
 class CLIResult(ToolResult):
     """A ToolResult that can be rendered as a CLI output."""
 
 
+@dataclass(slots=True)
 class ToolFailure(ToolResult):
     """A ToolResult that represents a failure."""
@@ -1,19 +1,24 @@
-from typing import Any, List, Optional, Type, Union, get_args, get_origin
+from types import MappingProxyType
+from typing import (
+    Any,
+    ClassVar,
+    Dict,
+    List,
+    Optional,
+    Type,
+    Union,
+    get_args,
+    get_origin,
+)
 
 from pydantic import BaseModel, Field
 
 from app.tool import BaseTool
 
 
-class CreateChatCompletion(BaseTool):
-    name: str = "create_chat_completion"
-    # 使用指定的输出格式
-    description: str = (
-        "Creates a structured completion with specified output formatting."
-    )
-
-    # Type mapping for JSON schema
-    type_mapping: dict = {
+# Type mapping for JSON schema
+_TYPE_MAPPING = MappingProxyType(
+    {
         str: "string",
         int: "integer",
         float: "number",
@@ -21,15 +26,35 @@ class CreateChatCompletion(BaseTool):
         dict: "object",
         list: "array",
     }
+)
+
+
+class CreateChatCompletion(BaseTool):
+    name: str = "create_chat_completion"
+    # 使用指定的输出格式
+    description: str = (
+        "Creates a structured completion with specified output formatting."
+    )
+
     response_type: Optional[Type] = None
     # 实例化后，required的取值是['response']
     required: List[str] = Field(default_factory=lambda: ["response"])
 
+    # 参数schema只由类和response_type决定，按(类, response_type)缓存，避免每次实例化都重新构建（包括model_json_schema()）；
+    # 键里带上具体的类，是因为子类可能重写_build_parameters或默认的required
+    # 缓存的dict在实例间共享，只读使用，不要原地修改
+    _SCHEMA_CACHE: ClassVar[Dict[Any, dict]] = {}
+
     def __init__(self, response_type: Optional[Type] = str):
         """Initialize with a specific response type."""
         super().__init__()
         self.response_type = response_type
-        self.parameters = self._build_parameters()
+        cache_key = (type(self), response_type)
+        parameters = CreateChatCompletion._SCHEMA_CACHE.get(cache_key)
+        if parameters is None:
+            parameters = self._build_parameters()
+            CreateChatCompletion._SCHEMA_CACHE[cache_key] = parameters
+        self.parameters = parameters
 
     # 函数功能：根据不同的response_type，设置不同的输出格式
     # 在_build_parameters+_create_type_schema中专门定义了下面几种response_type
@@ -51,7 +76,7 @@ class CreateChatCompletion(BaseTool):
                         "description": "The response text that should be delivered to the user.",
                     },
                 },
-                "required": self.required,
+                "required": list(self.required),
             }
 
         # isinstance(self.response_type, type) 这个基本上都会满足，但是是否是BaseModel的子类就不一定了
@@ -83,7 +108,7 @@ class CreateChatCompletion(BaseTool):
             return {
                 "type": "object",
                 "properties": schema["properties"],
-                "required": schema.get("required", self.required), #['response']
+                "required": schema.get("required", list(self.required)), #['response']
             }
 
         return self._create_type_schema(self.response_type)
@@ -99,11 +124,11 @@ class CreateChatCompletion(BaseTool):
                 "type": "object",
                 "properties": {
                     "response": {
-                        "type": self.type_mapping.get(type_hint, "string"),
+                        "type": _TYPE_MAPPING.get(type_hint, "string"),
                         "description": f"Response of type {type_hint.__name__}",
                     }
                 },
-                "required": self.required,
+                "required": list(self.required),
             }
 
         # Handle List type
@@ -117,7 +142,7 @@ class CreateChatCompletion(BaseTool):
                         "items": self._get_type_info(item_type),
                     }
                 },
-                "required": self.required,
+                "required": list(self.required),
             }
 
         # Handle Dict type
@@ -131,7 +156,7 @@ class CreateChatCompletion(BaseTool):
                         "additionalProperties": self._get_type_info(value_type),
                     }
                 },
-                "required": self.required,
+                "required": list(self.required),
             }
 
         # Handle Union type
@@ -146,7 +171,7 @@ class CreateChatCompletion(BaseTool):
             return type_hint.model_json_schema()
 
         return {
-            "type": self.type_mapping.get(type_hint, "string"),
+            "type": _TYPE_MAPPING.get(type_hint, "string"),
             "description": f"Value of type {getattr(type_hint, '__name__', 'any')}",
         }
 
@@ -157,7 +182,7 @@ class CreateChatCompletion(BaseTool):
             "properties": {
                 "response": {"anyOf": [self._get_type_info(t) for t in types]}
             },
-            "required": self.required,
+            "required": list(self.required),
         }
 
     async def execute(self, required: list | None = None, **kwargs) -> Any:
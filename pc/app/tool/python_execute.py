@@ -1,3 +1,4 @@
+import asyncio
 import multiprocessing
 import sys
 from io import StringIO
@@ -51,7 +52,12 @@ class PythonExecute(BaseTool):
         Returns:
             Dict: Contains 'output' with execution output or error message and 'success' status.
         """
+        # Spawning and joining the worker process blocks, so keep it off the event loop
+        # to let other tool calls of the same turn run meanwhile
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self._execute_blocking, code, timeout)
 
+    def _execute_blocking(self, code: str, timeout: int) -> Dict:
         with multiprocessing.Manager() as manager:
             result = manager.dict({"observation": "", "success": False})
             if isinstance(__builtins__, dict):
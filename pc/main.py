@@ -3,6 +3,12 @@ import asyncio
 from app.agent.manus import Manus
 from app.logger import logger
 
+try:
+    # Optional: libuv-based event loop with cheaper awaits/callbacks (not on Windows)
+    import uvloop
+except ImportError:
+    uvloop = None
+
 # 异步函数 main
 async def main():
     agent = Manus()
@@ -22,4 +28,7 @@ async def main():
 
 if __name__ == "__main__":
     # asyncio.run 是 Python 3.7 引入的，用于运行异步函数并管理事件循环
-    asyncio.run(main())
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
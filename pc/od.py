@@ -1,62 +1,148 @@
+try:
+    # numba是可选依赖：安装了就用编译后的内核批量处理字符串，没有安装则退回纯Python实现
+    import numpy as np
+    from numba import njit
+except ImportError:
+    np = None
+    njit = None
+
 
 def sum_num(a,b):
     return a + b
 
 
+def _to_codes(s):
+    # 按字符（Unicode码点）转成数组，非ASCII字符也能和Python字符串的下标一一对应
+    return np.frombuffer(s.encode('utf-32-le'), dtype=np.uint32)
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _manacher_kernel(codes):
+        n = codes.shape[0]
+        m = 2 * n + 3
+        # 码点都是非负数，用负数表示'^'、'#'、'$'
+        t = np.full(m, -2, dtype=np.int64)
+        t[0] = -1
+        t[m - 1] = -3
+        for k in range(n):
+            t[2 * k + 2] = codes[k]
+        p = np.zeros(m, dtype=np.int64)
+        center = 0
+        right = 0
+        max_len = 0
+        max_center = 0
+        for i in range(1, m - 1):
+            if i < right:
+                p[i] = min(right - i, p[2 * center - i])
+            while t[i + p[i] + 1] == t[i - p[i] - 1]:
+                p[i] += 1
+            if i + p[i] > right:
+                center = i
+                right = i + p[i]
+            if p[i] > max_len:
+                max_len = p[i]
+                max_center = i
+        return (max_center - max_len) // 2, max_len
+
+    @njit(cache=True)
+    def _is_valid_kernel(codes):
+        # 40/41: '(' ')'  91/93: '[' ']'  123/125: '{' '}'
+        stack = np.empty(codes.shape[0], dtype=np.uint32)
+        top = 0
+        for c in codes:
+            if c == 41 or c == 93 or c == 125:
+                expected = 40 if c == 41 else (91 if c == 93 else 123)
+                if top == 0 or stack[top - 1] != expected:
+                    return False
+                top -= 1
+            else:
+                stack[top] = c
+                top += 1
+        return top == 0
+else:
+    _manacher_kernel = None
+    _is_valid_kernel = None
+
+
 def longestPalinfrome(s):
     n = len(s)
     if(n < 2):
         return s
 
-    max_len = 1
-    begin = 0
-    #dp[i][j]表示s[i..j]是否是回文串
-    dp = [[False] * n for _ in range(n)]
-    for i in range(n):
-        dp[i][i] = True
-
-    #枚举子串长度
-    for l in range(2, n+1):
-        #枚举左边界
-        for i in range(n):
-            #由l和i可以确定右边界，即j-i+1=l
-            j = l+i-1
-            #如果右边界越界，就可以退出当前循环
-            if j>=n:
-                break
-            print(i,j)
-            if(s[i] != s[j]):
-                dp[i][j] = False
-            else:
-                if(j-i<3):
-                    dp[i][j] = True
-                else:
-                    dp[i][j] = dp[i+1][j-1]
-
-            if dp[i][j] and j - i + 1 > max_len:
-                max_len = j-i+1
-                begin = i
+    if _manacher_kernel is not None:
+        begin, max_len = _manacher_kernel(_to_codes(s))
+        return s[begin:begin+max_len]
+
+    # Manacher算法，O(n)时间、O(n)空间
+    # 在字符间插入'#'，使奇偶长度的回文串统一为奇数长度；首尾的'^'、'$'作为哨兵，扩展时不用判断越界
+    t = '^#' + '#'.join(s) + '#$'
+    # p[i]表示t中以i为中心的回文半径（不含中心），也就是对应到s中的回文串长度
+    p = [0] * len(t)
+    center = right = 0
+    max_len = 0
+    max_center = 0
+    for i in range(1, len(t) - 1):
+        # 利用i关于center的对称点mirror，跳过已知的回文部分
+        if i < right:
+            p[i] = min(right - i, p[2 * center - i])
+        # 以i为中心继续向两边扩展
+        while t[i + p[i] + 1] == t[i - p[i] - 1]:
+            p[i] += 1
+        # 更新最右回文边界
+        if i + p[i] > right:
+            center, right = i, i + p[i]
+
+        if p[i] > max_len:
+            max_len = p[i]
+            max_center = i
+
+    begin = (max_center - max_len) // 2
     return s[begin:begin+max_len]
 
 
+# 括号编码成2位：'('/')'->0，'['/']'->1，'{'/'}'->2
+_OPEN_CODES = {'(': 0, '[': 1, '{': 2}
+_CLOSE_CODES = {')': 0, ']': 1, '}': 2}
+
+
 # 判断给定字符串是否是有效字符串
 def is_valid_str(s):
-    _map = {')':'(', '}':'{', ']':'['}
-    _stack = []
+    if _is_valid_kernel is not None:
+        return bool(_is_valid_kernel(_to_codes(s)))
+
+    # 栈用一个整数表示，每个元素占2位，入栈/出栈就是移位和按位与，不用创建Python对象
+    # 一个整数最多存32层（64位），更深的部分整块存到_full_words里
+    _stack = 0
+    _depth = 0
+    _full_words = []
     for char in s:
-        if(char in _map):
-            #如果栈为空，或者栈顶元素不是对应的左括号，就返回false
-            if len(_stack) == 0 or _stack[-1] != _map[char]:
+        code = _CLOSE_CODES.get(char)
+        if code is not None:
+            if _depth == 0:
+                #栈为空，返回false
+                if not _full_words:
+                    return False
+                _stack = _full_words.pop()
+                _depth = 32
+            #栈顶元素不是对应的左括号，返回false
+            if (_stack & 3) != code:
                 return False
-            _stack.pop() # 匹配成功，弹出
+            _stack >>= 2 # 匹配成功，弹出
+            _depth -= 1
         else:
-            #直接入栈
-            _stack.append(char)
+            code = _OPEN_CODES.get(char)
+            #不是括号的字符入栈后永远不会被弹出，结果一定是false
+            if code is None:
+                return False
+            if _depth == 32:
+                _full_words.append(_stack)
+                _stack = 0
+                _depth = 0
+            _stack = (_stack << 2) | code
+            _depth += 1
     #如果处理完毕后，栈为空，说明正确匹配
-    if(len(_stack) == 0):
-        return True
-    else:
-        return False
+    return _depth == 0 and not _full_words
 
 if __name__ == '__main__':
     # print(sum_num(1,2))
@@ -6,6 +6,12 @@ from app.flow.base import FlowType
 from app.flow.flow_factory import FlowFactory
 from app.logger import logger
 
+try:
+    # Optional: libuv-based event loop with cheaper awaits/callbacks (not on Windows)
+    import uvloop
+except ImportError:
+    uvloop = None
+
 
 async def run_flow():
     agents = {
@@ -47,4 +53,7 @@ async def run_flow():
 
 
 if __name__ == "__main__":
-    asyncio.run(run_flow())
+    if uvloop is not None:
+        uvloop.run(run_flow())
+    else:
+        asyncio.run(run_flow())
@@ -1,14 +1,26 @@
 from abc import ABC, abstractmethod
 from contextlib import asynccontextmanager
-from typing import List, Optional
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, List, Optional
 
-from pydantic import BaseModel, Field, model_validator
-
-from app.llm import LLM
 from app.logger import logger
 from app.schema import ROLE_TYPE, AgentState, Memory, Message
 
-class BaseAgent(BaseModel):
+if TYPE_CHECKING:
+    from app.llm import LLM
+
+
+def _default_llm() -> "LLM":
+    # app.llm pulls in openai/httpx/tiktoken, so only import it once an agent needs an LLM
+    from app.llm import LLM
+
+    return LLM()
+
+
+# 字段都是内部可信的值，不需要pydantic在实例化和每次赋值（如self.current_step += 1）时做校验，
+# 所以用带__slots__的dataclass：没有实例__dict__，属性读写就是一次slot存取
+@dataclass(slots=True)
+class BaseAgent:
     """Abstract base class for managing agent state and execution.
 
     Provides foundational functionality for state transitions, memory management,
@@ -20,42 +32,19 @@ class BaseAgent(BaseModel):
 
     # Core attributes
     # name: str = Field(..., description="Unique name of the agent")
-    description: Optional[str] = Field(None, description="Optional agent description")
+    description: Optional[str] = None  # Optional agent description
 
     # Prompts
-    system_prompt: Optional[str] = Field(
-        None, description="System-level instruction prompt"
-    )
-    next_step_prompt: Optional[str] = Field(
-        None, description="Prompt for determining next action"
-    )
+    system_prompt: Optional[str] = None  # System-level instruction prompt
+    next_step_prompt: Optional[str] = None  # Prompt for determining next action
 
     # Dependencies
-    llm: LLM = Field(default_factory=LLM, description="Language model instance")
-    memory: Memory = Field(default_factory=Memory, description="Agent's memory store")
-    state: AgentState = Field(
-        default=AgentState.IDLE, description="Current agent state"
-    )
+    llm: "LLM" = field(default_factory=_default_llm)  # Language model instance
+    memory: Memory = field(default_factory=Memory)  # Agent's memory store
+    state: AgentState = AgentState.IDLE  # Current agent state
 
     # Execution control
-    max_steps: int = Field(default=10, description="Maximum steps before termination")
-    current_step: int = Field(default=0, description="Current step in execution")
+    max_steps: int = 10  # Maximum steps before termination
+    current_step: int = 0  # Current step in execution
 
     duplicate_threshold: int = 2
-
-    class Config:
-        arbitrary_types_allowed = True
-        extra = "allow"  # Allow extra fields for flexibility in subclasses
-
-    # # 在class中定义llm、memory两个变量时，就已经做了赋值，而且都是LLM Memory示例
-    # # initialize_agent是发生在实例初始化后执行，所以两个if都不会执行到
-    # @model_validator(mode="after")
-    # def initialize_agent(self) -> "BaseAgent":
-    #     """Initialize agent with default settings if not provided."""
-    #     if self.llm is None or not isinstance(self.llm, LLM):
-    #         self.llm = LLM(config_name=self.name.lower())
-    #     if not isinstance(self.memory, Memory):
-    #         self.memory = Memory()
-    #     return self
-
-